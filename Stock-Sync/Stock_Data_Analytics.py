@@ -0,0 +1,276 @@
+# Stock_Data_Analytics.py
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from Stock_Data_Merge import safe_read_csv, company_symbol_map, normalize_company_name
+
+SNAPSHOT_COLS = ["DATE", "SYMBOL", "CLOSE", "NET_TRDQTY", "DELIV_PER",
+                 "HI_52_WK", "LO_52_WK", "INSIDER_NET", "PLEDGE_PCT"]
+
+PLEDGE_COL = "PROMOTER SHARES ENCUMBERED AS OF LAST QUARTER % OF TOTAL SHARES [X/(A+B+C)]"
+INSIDER_VALUE_COL = "VALUE OF SECURITY (ACQUIRED/DISPLOSED)"
+INSIDER_TYPE_COL = "ACQUISITION/DISPOSAL TRANSACTION TYPE"
+INSIDER_DATE_COL = "BROADCASTE DATE AND TIME"
+
+
+def _to_number(series):
+    # NSE files pad numbers with spaces and use Indian digit grouping
+    return pd.to_numeric(series.astype(str).str.replace(",", "").str.strip(), errors="coerce")
+
+
+def _load_csv(folder_path, keyword):
+    for f in os.listdir(folder_path):
+        if f.lower().endswith(".csv") and re.search(keyword, f, re.IGNORECASE):
+            return safe_read_csv(os.path.join(folder_path, f))
+    return pd.DataFrame()
+
+
+def insider_net(insider, dates, since=None):
+    """
+    Signed insider value (buys positive, sells negative) per (DATE, SYMBOL).
+    Each disclosure goes to the first of `dates` on or after its broadcast
+    day, so weekend/holiday filings land on the next trading snapshot.
+    Disclosures after the last date, or on/before `since` (default: before
+    the first date), are left out.
+    """
+    empty = pd.Series(dtype=float, index=pd.MultiIndex.from_arrays([[], []], names=["DATE", "SYMBOL"]))
+    needed = {"SYMBOL", INSIDER_VALUE_COL, INSIDER_TYPE_COL, INSIDER_DATE_COL}
+    if not needed.issubset(insider.columns) or len(dates) == 0:
+        return empty
+
+    dates = np.sort(pd.to_datetime(pd.Series(dates)).values)
+    day = pd.to_datetime(insider[INSIDER_DATE_COL], format="%d-%b-%Y %H:%M", errors="coerce").dt.normalize()
+    lower = day > pd.Timestamp(since) if since is not None else day >= dates[0]
+    keep = (lower & (day <= dates[-1])).values
+    if not keep.any():
+        return empty
+
+    it = insider[keep]
+    slot = dates[np.searchsorted(dates, day[keep].values, side="left")]
+    kind = it[INSIDER_TYPE_COL].astype(str).str.strip().str.lower()
+    sign = np.select([kind == "buy", kind == "sell"], [1.0, -1.0], 0.0)
+    value = _to_number(it[INSIDER_VALUE_COL]).fillna(0).values * sign
+    index = pd.MultiIndex.from_arrays([slot, it["SYMBOL"].astype(str).str.strip().values],
+                                      names=["DATE", "SYMBOL"])
+    return pd.Series(value, index=index).groupby(level=[0, 1]).sum()
+
+
+# ---------------------------------------------------------------
+# Daily snapshot
+# ---------------------------------------------------------------
+def build_snapshot(folder_path, date, since=None):
+    """
+    Collapse one day's CSVs (playground layout) into one row per SYMBOL
+    with the SNAPSHOT_COLS columns. Missing files/columns give NaN.
+    INSIDER_NET covers disclosures broadcast after `since` (pass the
+    previous snapshot date) up to `date`; without it only `date` itself.
+    DELIV_PER needs the full bhavcopy format that carries that column;
+    the bundled sec_bhavdata_full.csv sample does not, so it stays NaN.
+    """
+    date = pd.Timestamp(date)
+    bhav = _load_csv(folder_path, "bhavdata")
+    insider = _load_csv(folder_path, "Insider")
+    sast = _load_csv(folder_path, "SAST-Regular")
+    pledged = _load_csv(folder_path, "SAST-Pledged")
+
+    if "SYMBOL" not in bhav.columns:
+        return pd.DataFrame(columns=SNAPSHOT_COLS)
+
+    # One row per symbol, preferring the EQ series
+    bhav = bhav.copy()
+    bhav["SYMBOL"] = bhav["SYMBOL"].astype(str).str.strip()
+    if "SERIES" in bhav.columns:
+        bhav["_eq"] = bhav["SERIES"].astype(str).str.strip() != "EQ"
+        bhav = bhav.sort_values("_eq", kind="stable")
+    bhav = bhav.drop_duplicates("SYMBOL")
+
+    snap = pd.DataFrame({"SYMBOL": bhav["SYMBOL"].values})
+    for out, col in [("CLOSE", "CLOSE_PRICE"), ("NET_TRDQTY", "NET_TRDQTY"), ("DELIV_PER", "DELIV_PER"),
+                     ("HI_52_WK", "HI_52_WK"), ("LO_52_WK", "LO_52_WK")]:
+        snap[out] = _to_number(bhav[col]).values if col in bhav.columns else np.nan
+
+    net = insider_net(insider, [date], since).droplevel("DATE")
+    snap["INSIDER_NET"] = snap["SYMBOL"].map(net).fillna(0.0).values
+
+    # Promoter pledge %, keyed by company name in the source file
+    pledge = pd.Series(dtype=float)
+    if {"NAME OF COMPANY", PLEDGE_COL}.issubset(pledged.columns):
+        symbols = company_symbol_map(insider, sast)
+        keys = pledged["NAME OF COMPANY"].map(lambda c: symbols.get(normalize_company_name(c)))
+        pledge = pd.Series(_to_number(pledged[PLEDGE_COL]).values, index=keys.values)
+        pledge = pledge[pledge.index.notna()].groupby(level=0).last()
+    snap["PLEDGE_PCT"] = snap["SYMBOL"].map(pledge).values
+
+    snap.insert(0, "DATE", date)
+    return snap[SNAPSHOT_COLS]
+
+
+def load_panel(history_dir):
+    """
+    Build a multi-day panel from history_dir/<YYYY-MM-DD>/ snapshot folders.
+    Insider disclosures from every folder are pooled (duplicates across
+    daily downloads dropped) and each is counted once, on the first panel
+    date on or after its broadcast date.
+    """
+    frames, insiders = [], []
+    for name in sorted(os.listdir(history_dir)):
+        path = os.path.join(history_dir, name)
+        if os.path.isdir(path) and re.fullmatch(r"\d{4}-\d{2}-\d{2}", name):
+            frames.append(build_snapshot(path, name))
+            insiders.append(_load_csv(path, "Insider"))
+    if not frames:
+        return pd.DataFrame(columns=SNAPSHOT_COLS)
+    panel = pd.concat(frames, ignore_index=True)
+
+    pooled = pd.concat(insiders, ignore_index=True).drop_duplicates()
+    net = insider_net(pooled, panel["DATE"].unique())
+    keys = pd.MultiIndex.from_frame(panel[["DATE", "SYMBOL"]])
+    panel["INSIDER_NET"] = net.reindex(keys).fillna(0.0).values
+    return panel
+
+
+# ---------------------------------------------------------------
+# Grouped rolling primitives (rows sorted by SYMBOL, DATE)
+# ---------------------------------------------------------------
+def _group_positions(codes):
+    """Row index of each group's first row, and each row's offset within its group."""
+    idx = np.arange(len(codes))
+    starts = np.ones(len(codes), dtype=bool)
+    starts[1:] = codes[1:] != codes[:-1]
+    first = np.maximum.accumulate(np.where(starts, idx, 0))
+    return first, idx - first
+
+
+def _shift(x, pos, k):
+    out = np.full(len(x), np.nan)
+    if k < len(x):
+        out[k:] = x[:len(x) - k]
+    out[pos < k] = np.nan
+    return out
+
+
+def _group_cumsum(x, codes):
+    # Restarts at every group so one symbol's magnitudes never swamp another's
+    return pd.Series(x).groupby(codes, sort=False).cumsum().to_numpy(dtype=float)
+
+
+def _rolling_sum(x, codes, pos, window, min_periods):
+    """Windowed sum and valid-count per group via per-group cumulative sums (NaN skipped)."""
+    valid = ~np.isnan(x)
+    cs = _group_cumsum(np.where(valid, x, 0.0), codes)
+    cn = _group_cumsum(valid.astype(float), codes)
+    total = cs - np.nan_to_num(_shift(cs, pos, window))
+    count = cn - np.nan_to_num(_shift(cn, pos, window))
+    total[count < min_periods] = np.nan
+    return total, count
+
+
+def _ffill(x, first):
+    idx = np.where(np.isnan(x), -1, np.arange(len(x)))
+    last = np.maximum.accumulate(idx)
+    out = x[np.maximum(last, 0)]
+    out[last < first] = np.nan
+    return out
+
+
+# ---------------------------------------------------------------
+# Rolling analytics
+# ---------------------------------------------------------------
+def compute_rolling(panel, window=20):
+    """
+    Per-symbol rolling metrics over a SNAPSHOT_COLS panel. Every metric is a
+    single vectorized pass over the whole panel, sorted by SYMBOL then DATE.
+      RETURN_1D / RETURN_ND  close-to-close return over 1 and `window` days
+      VOLUME_Z               NET_TRDQTY z-score vs the trailing window
+      DELIV_TREND            slope (pct points/day) of DELIV_PER over the window;
+                             only present when the panel has DELIV_PER values
+      INSIDER_NET_ND         cumulative net insider buying over the window
+      PLEDGE_CHG_ND          change in promoter pledge % over the window
+      PCT_FROM_52W_HI        CLOSE relative to the 52-week high
+    """
+    df = panel.sort_values(["SYMBOL", "DATE"], kind="stable").reset_index(drop=True)
+    codes = pd.factorize(df["SYMBOL"])[0]
+    first, pos = _group_positions(codes)
+
+    def col(name):
+        return df[name].to_numpy(dtype=float) if name in df.columns else np.full(len(df), np.nan)
+
+    close = col("CLOSE")
+    volume = col("NET_TRDQTY")
+    deliv = col("DELIV_PER")
+    insider = np.nan_to_num(col("INSIDER_NET"))
+    pledge = _ffill(col("PLEDGE_PCT"), first)
+
+    out = df[["DATE", "SYMBOL"]].copy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["RETURN_1D"] = close / _shift(close, pos, 1) - 1
+        out[f"RETURN_{window}D"] = close / _shift(close, pos, window) - 1
+
+        # Z-score against the previous `window` days (today excluded). Volume
+        # is centred on each symbol's mean first so the sum-of-squares form
+        # does not cancel away the variance of large, steady volumes.
+        centre = pd.Series(volume).groupby(codes, sort=False).transform("mean").to_numpy()
+        prev_vol = _shift(volume - centre, pos, 1)
+        s1, n = _rolling_sum(prev_vol, codes, pos, window, window)
+        s2, _ = _rolling_sum(prev_vol ** 2, codes, pos, window, window)
+        mean = s1 / n
+        var = s2 / n - mean ** 2
+        # Variances within rounding of the running sum are treated as zero,
+        # so flat-volume windows give NaN rather than huge spurious scores
+        noise = 1e-12 * _group_cumsum(np.nan_to_num(prev_vol ** 2), codes) / n
+        std = np.sqrt(np.maximum(var, 0) * n / (n - 1))
+        out["VOLUME_Z"] = np.where(var > noise, (volume - centre - mean) / std, np.nan)
+
+        # Least-squares slope with t = position in group
+        if not np.isnan(deliv).all():
+            t = pos.astype(float)
+            t_obs = np.where(np.isnan(deliv), np.nan, t)
+            sy, n = _rolling_sum(deliv, codes, pos, window, window)
+            st, _ = _rolling_sum(t_obs, codes, pos, window, window)
+            sty, _ = _rolling_sum(t_obs * deliv, codes, pos, window, window)
+            stt, _ = _rolling_sum(t_obs ** 2, codes, pos, window, window)
+            out["DELIV_TREND"] = (n * sty - st * sy) / (n * stt - st ** 2)
+
+        out[f"INSIDER_NET_{window}D"] = _rolling_sum(insider, codes, pos, window, 1)[0]
+        out[f"PLEDGE_CHG_{window}D"] = pledge - _shift(pledge, pos, window)
+        out["PCT_FROM_52W_HI"] = close / col("HI_52_WK") - 1
+    return out
+
+
+def append_day(panel, snapshot, window=20):
+    """
+    Incremental update: add one day's snapshot and compute metrics for that
+    day only, using just the last window+1 rows per symbol. Build the
+    snapshot with since=<previous snapshot date> so insider disclosures
+    from the days in between are included. Returns
+    (trimmed panel to keep for the next call, metrics for the new day).
+    """
+    date = pd.Timestamp(snapshot["DATE"].iloc[0])
+    panel = panel[panel["DATE"] != date] if len(panel) else panel
+    combined = pd.concat([panel, snapshot], ignore_index=True)
+    # Carry pledge forward so trimming never drops the last known value
+    combined = combined.sort_values(["SYMBOL", "DATE"], kind="stable")
+    combined["PLEDGE_PCT"] = combined.groupby("SYMBOL")["PLEDGE_PCT"].ffill()
+    tail = combined.groupby("SYMBOL", sort=False).tail(window + 1).reset_index(drop=True)
+    metrics = compute_rolling(tail, window)
+    return tail, metrics[metrics["DATE"] == date].reset_index(drop=True)
+
+
+def run_analytics(history_dir=None, window=20):
+    """
+    Compute rolling metrics over every dated snapshot folder in history_dir
+    (default: playground/history) and save Rolling_Analytics.csv there.
+    """
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    if history_dir is None:
+        history_dir = os.path.join(base_dir, "playground", "history")
+
+    panel = load_panel(history_dir)
+    df = compute_rolling(panel, window)
+
+    output_path = os.path.join(history_dir, "Rolling_Analytics.csv")
+    df.to_csv(output_path, index=False)
+    return df, output_path
@@ -27,6 +27,18 @@ def smart_normalize_company(df):
         df.rename(columns={"NAME OF COMPANY": "COMPANY"}, inplace=True)
     return df
 
+def normalize_company_name(name):
+    return re.sub(r"\s+", " ", str(name)).strip().upper()
+
+def company_symbol_map(*dfs):
+    """Build {normalized company name: SYMBOL} from frames carrying both columns."""
+    mapping = {}
+    for df in dfs:
+        if df is not None and {"SYMBOL", "COMPANY"}.issubset(df.columns):
+            for sym, comp in zip(df["SYMBOL"], df["COMPANY"]):
+                mapping.setdefault(normalize_company_name(comp), sym)
+    return mapping
+
 def run_merge():
     base_dir = os.path.dirname(os.path.abspath(__file__))
     folder_path = os.path.join(base_dir, "playground")
@@ -0,0 +1,439 @@
+# Stock_Data_XBRL.py
+import asyncio
+import hashlib
+import http.client
+import json
+import os
+import random
+import re
+import xml.etree.ElementTree as ET
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+from Stock_Data_Merge import safe_read_csv, company_symbol_map, normalize_company_name
+
+# NSE archives reject requests without a browser-like user agent
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Accept": "application/xml,text/xml,*/*",
+    "Connection": "keep-alive",
+}
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Filing-level output column -> candidate XBRL element local names
+# (earlier names win). Shareholding (SHP_*) and insider (IT_*) filings use
+# different taxonomies, so each column lists the names seen in either.
+XBRL_FIELDS = {
+    "SYMBOL": ("Symbol", "NSESymbol"),
+    "COMPANY": ("NameOfTheCompany", "NameOfCompany"),
+    "ISIN": ("ISIN", "ISINOfCompany"),
+    "SCRIP CODE": ("ScripCode",),
+    "REPORT DATE": ("DateOfReport", "ShareholdingPatternAsOnDate", "DateOfIntimationToCompany"),
+    "SHARES PLEDGED": ("NumberOfSharesPledgedOrOtherwiseEncumbered",),
+    "TOTAL SHARES": ("NumberOfFullyPaidUpEquityShares", "TotalNumberOfShares"),
+}
+
+# Facts like share counts are reported once per shareholder category, so a
+# filing-level column only accepts them from the whole-company context(s).
+XBRL_FIELD_CONTEXTS = {
+    "SHARES PLEDGED": ("ShareholdingPatternI",),
+    "TOTAL SHARES": ("ShareholdingPatternI",),
+}
+
+# Per-transaction columns. An insider filing repeats these once per
+# transaction, each under its own contextRef; every context becomes a row.
+XBRL_TRANSACTION_FIELDS = {
+    "PERSON": ("NameOfThePerson", "NameOfTheAcquirerOrDisposer"),
+    "CATEGORY OF PERSON": ("CategoryOfPerson",),
+    "MODE OF ACQUISITION": ("ModeOfAcquisitionOrDisposal", "ModeOfAcquisition"),
+    "SECURITIES ACQUIRED/DISPOSED": ("NumberOfSecuritiesAcquiredOrDisposed",),
+    "VALUE ACQUIRED/DISPOSED": ("ValueOfSecuritiesAcquiredOrDisposed",),
+}
+
+# Insider CSV columns carrying the same per-transaction detail, used when a
+# filing cannot be fetched or parsed
+INSIDER_CSV_FIELDS = {
+    "NAME OF THE ACQUIRER/DISPOSER": "PERSON",
+    "CATEGORY OF PERSON": "CATEGORY OF PERSON",
+    "MODE OF ACQUISITION": "MODE OF ACQUISITION",
+    "NO. OF SECURITIES (ACQUIRED/DISPLOSED)": "SECURITIES ACQUIRED/DISPOSED",
+    "VALUE OF SECURITY (ACQUIRED/DISPLOSED)": "VALUE ACQUIRED/DISPOSED",
+}
+
+
+# ---------------------------------------------------------------
+# Content-addressed cache
+# ---------------------------------------------------------------
+def _blob_path(cache_dir, digest):
+    return os.path.join(cache_dir, "objects", digest[:2], digest + ".xml")
+
+
+def load_index(cache_dir):
+    path = os.path.join(cache_dir, "index.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_index(cache_dir, index):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, "index.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def cached_path(cache_dir, index, url):
+    """Return the cached blob for url, or None if it has not been fetched."""
+    digest = index.get(url)
+    if digest:
+        path = _blob_path(cache_dir, digest)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def store_blob(cache_dir, body):
+    digest = hashlib.sha256(body).hexdigest()
+    path = _blob_path(cache_dir, digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)
+    return digest
+
+
+# ---------------------------------------------------------------
+# Async fetcher
+# ---------------------------------------------------------------
+class _HostPool:
+    """Keep-alive connections for one host; its size is the per-host limit."""
+
+    def __init__(self, scheme, netloc, size, timeout):
+        self.scheme = scheme
+        self.netloc = netloc
+        self.timeout = timeout
+        self.idle = asyncio.LifoQueue()
+        for _ in range(size):
+            self.idle.put_nowait(None)
+
+    def connect(self):
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.netloc, timeout=self.timeout)
+
+
+def _request(conn, target):
+    conn.request("GET", target, headers=HEADERS)
+    resp = conn.getresponse()
+    # Always drain the body so the connection can be reused
+    return resp.status, resp.read()
+
+
+def _resolve(url, source):
+    """Map a filing URL onto the configured source (None, a base URL or a directory)."""
+    if source is None:
+        return url
+    if os.path.isdir(source):
+        return os.path.join(source, os.path.basename(urlsplit(url).path))
+    parts = urlsplit(url)
+    target = parts.path + ("?" + parts.query if parts.query else "")
+    return source.rstrip("/") + target
+
+
+class XBRLFetcher:
+    """
+    Fetch XBRL filings concurrently into a content-addressed cache.
+    source: None for the live site, a base URL (e.g. a local stand-in server)
+            that replaces scheme+host, or a directory of saved XML files.
+    """
+
+    def __init__(self, cache_dir, source=None, max_connections=8, per_host=2,
+                 retries=3, backoff=0.5, timeout=30):
+        self.cache_dir = cache_dir
+        self.source = source
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.index = load_index(cache_dir)
+        self.errors = {}
+        self._pools = {}
+
+    def _pool(self, scheme, netloc):
+        key = (scheme, netloc)
+        if key not in self._pools:
+            self._pools[key] = _HostPool(scheme, netloc, self.per_host, self.timeout)
+        return self._pools[key]
+
+    async def _get_http(self, url):
+        parts = urlsplit(url)
+        target = parts.path + ("?" + parts.query if parts.query else "")
+        pool = self._pool(parts.scheme, parts.netloc)
+        for attempt in range(self.retries + 1):
+            conn = await pool.idle.get()
+            try:
+                if conn is None:
+                    conn = pool.connect()
+                status, body = await asyncio.to_thread(_request, conn, target)
+            except (OSError, http.client.HTTPException) as e:
+                if conn is not None:
+                    conn.close()
+                conn = None
+                error = str(e)
+            else:
+                if status == 200:
+                    return body
+                error = f"HTTP {status}"
+                if status not in RETRY_STATUS:
+                    raise IOError(error)
+            finally:
+                pool.idle.put_nowait(conn)
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff * 2 ** attempt * (1 + random.random()))
+        raise IOError(error)
+
+    def location(self, url):
+        """Where url is actually read from; also its cache index key, so
+        stand-in content never masquerades as the live filing."""
+        location = _resolve(url, self.source)
+        if self.source is not None and os.path.isdir(self.source):
+            location = os.path.abspath(location)
+        return location
+
+    async def _fetch_one(self, url, limit):
+        location = self.location(url)
+        async with limit:
+            try:
+                if self.source is not None and os.path.isdir(self.source):
+                    body = await asyncio.to_thread(_read_file, location)
+                else:
+                    body = await self._get_http(location)
+            except Exception as e:
+                self.errors[url] = str(e)
+                return
+        self.index[location] = store_blob(self.cache_dir, body)
+
+    async def fetch(self, urls):
+        """Fetch every url not already cached. Returns {url: cached path or None}."""
+        urls = list(dict.fromkeys(u for u in urls if isinstance(u, str) and u.strip()))
+        todo = [u for u in urls if cached_path(self.cache_dir, self.index, self.location(u)) is None]
+        limit = asyncio.Semaphore(self.max_connections)
+        try:
+            await asyncio.gather(*(self._fetch_one(u, limit) for u in todo))
+        finally:
+            save_index(self.cache_dir, self.index)
+            for pool in self._pools.values():
+                while not pool.idle.empty():
+                    conn = pool.idle.get_nowait()
+                    if conn is not None:
+                        conn.close()
+            self._pools.clear()
+        return {u: cached_path(self.cache_dir, self.index, self.location(u)) for u in urls}
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def fetch_xbrl(urls, cache_dir, **kwargs):
+    """Synchronous wrapper around XBRLFetcher.fetch. Returns (paths, errors)."""
+    fetcher = XBRLFetcher(cache_dir, **kwargs)
+    paths = asyncio.run(fetcher.fetch(urls))
+    return paths, fetcher.errors
+
+
+# ---------------------------------------------------------------
+# Streaming parser
+# ---------------------------------------------------------------
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1].split(":")[-1]
+
+
+def _name_ranks(fields):
+    wanted = {}
+    for col, names in fields.items():
+        for rank, name in enumerate(names):
+            wanted.setdefault(name, []).append((col, rank))
+    return wanted
+
+
+def _keep_best(found, col, text, rank):
+    if col not in found or rank < found[col][1]:
+        found[col] = (text, rank)
+
+
+def parse_xbrl(path, fields=XBRL_FIELDS, transaction_fields=XBRL_TRANSACTION_FIELDS,
+               field_contexts=XBRL_FIELD_CONTEXTS):
+    """
+    Stream one XBRL file and return a list of row dicts: one per transaction
+    (facts grouped by contextRef, or by parent element when a fact has no
+    contextRef), each carrying the filing-level columns too. A filing with
+    no transaction facts gives a single row. Elements are cleared as they
+    are read so large filings never sit fully in memory.
+    """
+    filing_names = _name_ranks(fields)
+    txn_names = _name_ranks(transaction_fields)
+
+    filing = {}
+    txns = {}  # group key -> {col: (text, rank)}, insertion = document order
+    stack = []  # open (element, serial) pairs; serials identify parent groups
+    serial = 0
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            serial += 1
+            stack.append((elem, serial))
+            continue
+        stack.pop()
+        name = _local_name(elem.tag)
+        text = (elem.text or "").strip()
+        if text and (name in filing_names or name in txn_names):
+            context = elem.get("contextRef")
+            for col, rank in filing_names.get(name, ()):
+                allowed = field_contexts.get(col)
+                if allowed is None:
+                    _keep_best(filing, col, text, rank)
+                elif context in allowed:
+                    _keep_best(filing, col, text, (rank, allowed.index(context)))
+            if name in txn_names:
+                key = ("context", context) if context else ("parent", stack[-1][1] if stack else 0)
+                group = txns.setdefault(key, {})
+                for col, rank in txn_names[name]:
+                    _keep_best(group, col, text, rank)
+        elem.clear()
+        if stack:
+            stack[-1][0].remove(elem)
+
+    base = {col: value for col, (value, _) in filing.items()}
+    if not txns:
+        return [base]
+    rows = []
+    for n, group in enumerate(txns.values(), start=1):
+        row = dict(base, TXN=n)
+        row.update({col: value for col, (value, _) in group.items()})
+        rows.append(row)
+    return rows
+
+
+# ---------------------------------------------------------------
+# Link collection + table build
+# ---------------------------------------------------------------
+def collect_xbrl_links(folder_path):
+    """
+    Gather XBRL links from the insider (XBRL column) and shareholding
+    (ACTION column) CSVs as SOURCE, SYMBOL, COMPANY, URL rows, one per CSV
+    row; insider rows also keep their transaction columns.
+    Shareholding rows only carry COMPANY, so SYMBOL is looked up from the
+    insider and SAST-Regular files.
+    """
+    files = [f for f in os.listdir(folder_path) if f.lower().endswith(".csv")]
+
+    def find(keyword):
+        for f in files:
+            if re.search(keyword, f, re.IGNORECASE):
+                return os.path.join(folder_path, f)
+        return None
+
+    insider = safe_read_csv(find("Insider")) if find("Insider") else pd.DataFrame()
+    sast = safe_read_csv(find("SAST-Regular")) if find("SAST-Regular") else pd.DataFrame()
+    sharehold = safe_read_csv(find("Shareholding")) if find("Shareholding") else pd.DataFrame()
+
+    frames = []
+    if {"SYMBOL", "XBRL"}.issubset(insider.columns):
+        extra = [c for c in INSIDER_CSV_FIELDS if c in insider.columns]
+        it = insider[["SYMBOL", "COMPANY", "XBRL"] + extra].rename(columns={"XBRL": "URL", **INSIDER_CSV_FIELDS})
+        it.insert(0, "SOURCE", "INSIDER")
+        frames.append(it)
+
+    if {"COMPANY", "ACTION"}.issubset(sharehold.columns):
+        symbol_map = company_symbol_map(insider, sast)
+        shp = sharehold[["COMPANY", "ACTION"]].rename(columns={"ACTION": "URL"})
+        shp.insert(0, "SYMBOL", shp["COMPANY"].map(lambda c: symbol_map.get(normalize_company_name(c))))
+        shp.insert(0, "SOURCE", "SHAREHOLDING")
+        frames.append(shp)
+
+    if not frames:
+        return pd.DataFrame(columns=["SOURCE", "SYMBOL", "COMPANY", "URL"] + list(INSIDER_CSV_FIELDS.values()))
+    links = pd.concat(frames, ignore_index=True)
+    # Several CSV rows can share one filing; the fetcher dedupes URLs itself
+    return links[links["URL"].astype(str).str.match(r"https?://", na=False)].reset_index(drop=True)
+
+
+def build_xbrl_table(links, paths, fields=XBRL_FIELDS, transaction_fields=XBRL_TRANSACTION_FIELDS,
+                     field_contexts=XBRL_FIELD_CONTEXTS):
+    """
+    Parse each cached filing once and return one row per transaction,
+    joinable on SYMBOL. When a filing cannot be fetched or parsed, or (for
+    insider filings) its parsed transactions are fewer than the CSV rows or
+    miss a column the CSV has, the CSV rows are kept instead, topped up with
+    the filing-level fields, so nothing drops out of the table.
+    """
+    txn_cols = list(transaction_fields)
+    rows = []
+    for url, group in links.groupby("URL", sort=False):
+        first = group.iloc[0]
+        path = paths.get(url)
+        parsed = []
+        if path:
+            try:
+                parsed = parse_xbrl(path, fields, transaction_fields, field_contexts)
+            except ET.ParseError:
+                parsed = []
+
+        csv_rows = group.to_dict("records")
+        if parsed and first["SOURCE"] == "INSIDER":
+            txns = [item for item in parsed if any(item.get(c) for c in txn_cols)]
+            csv_cols = [c for c in txn_cols if c in group.columns and group[c].notna().any()]
+            complete = all(any(item.get(c) for item in txns) for c in csv_cols)
+            if len(txns) < len(csv_rows) or not complete:
+                filing = {k: v for k, v in parsed[0].items() if k not in txn_cols and k != "TXN"}
+                for rec in csv_rows:
+                    rec.update({k: v for k, v in filing.items() if pd.isna(rec.get(k))})
+                parsed = []
+        if not parsed:
+            rows.extend(csv_rows)
+            continue
+
+        for item in parsed:
+            row = {"SOURCE": first["SOURCE"], "SYMBOL": first["SYMBOL"], "URL": url}
+            # CSV values win for the join keys; XBRL fills the gaps
+            if pd.isna(row["SYMBOL"]) and item.get("SYMBOL"):
+                row["SYMBOL"] = item["SYMBOL"]
+            row.update({k: v for k, v in item.items() if k != "SYMBOL"})
+            if not row.get("COMPANY"):
+                row["COMPANY"] = first["COMPANY"]
+            rows.append(row)
+    columns = (["SOURCE", "SYMBOL", "URL", "TXN"] + [c for c in fields if c != "SYMBOL"]
+               + txn_cols)
+    return pd.DataFrame(rows, columns=columns)
+
+
+def run_xbrl(folder_path=None, source=None, **fetch_kwargs):
+    """
+    Fetch + parse every linked XBRL filing and save XBRL_Details.csv.
+    Re-runs only download filings missing from playground/xbrl_cache; the
+    cache is keyed by where a filing was read from, so runs against a
+    stand-in `source` never satisfy later live runs.
+    Returns (dataframe, output_path, errors).
+    """
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    if folder_path is None:
+        folder_path = os.path.join(base_dir, "playground")
+    cache_dir = os.path.join(folder_path, "xbrl_cache")
+
+    links = collect_xbrl_links(folder_path)
+    paths, errors = fetch_xbrl(links["URL"].tolist(), cache_dir, source=source, **fetch_kwargs)
+    df = build_xbrl_table(links, paths)
+
+    output_path = os.path.join(folder_path, "XBRL_Details.csv")
+    df.to_csv(output_path, index=False)
+    return df, output_path, errors
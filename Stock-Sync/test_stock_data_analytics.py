@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from Stock_Data_Analytics import compute_rolling
+
+WINDOW = 20
+
+
+def _panel(volumes):
+    dates = pd.bdate_range("2023-01-02", periods=len(next(iter(volumes.values()))))
+    frames = [pd.DataFrame({"DATE": dates, "SYMBOL": sym, "CLOSE": 100.0, "NET_TRDQTY": vol})
+              for sym, vol in volumes.items()]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _reference_z(panel):
+    df = panel.sort_values(["SYMBOL", "DATE"]).reset_index(drop=True)
+    prev = df.groupby("SYMBOL")["NET_TRDQTY"].shift(1)
+    roll = prev.groupby(df["SYMBOL"]).rolling(WINDOW)
+    mean = roll.mean().reset_index(level=0, drop=True)
+    std = roll.std().reset_index(level=0, drop=True)
+    return (df["NET_TRDQTY"] - mean) / std
+
+
+def test_volume_z_matches_groupby_rolling_on_mixed_magnitudes():
+    rng = np.random.default_rng(0)
+    days = 750
+    panel = _panel({
+        "AAA": rng.normal(5e9, 1e8, days).round(),
+        "MID": rng.lognormal(12, 1, days).round(),
+        "ZZZ": rng.normal(300, 50, days).round(),
+    })
+    got = compute_rolling(panel, WINDOW)["VOLUME_Z"]
+    expected = _reference_z(panel)
+
+    assert got.notna().sum() == expected.notna().sum() == 3 * (days - WINDOW)
+    np.testing.assert_allclose(got, expected, rtol=1e-6, atol=1e-9)
+
+
+def test_volume_z_is_nan_for_flat_volume_windows():
+    panel = _panel({"AAA": np.full(60, 5e9), "FLAT": np.full(60, 1234.0)})
+    got = compute_rolling(panel, WINDOW)["VOLUME_Z"]
+    assert got.isna().all()